@@ -1,19 +1,28 @@
-import difflib
+import contextlib
+import hashlib
 import sys
+import threading
 import time
 import argparse
 import os
 import traceback
 
+from concurrent.futures import ThreadPoolExecutor
+
 from .utils.common import load_config, load_env, prettify_solidity
 from .utils.constants import (
     DIFFS_DIR,
     DEFAULT_CONFIG_PATH,
     DEFAULT_HARDHAT_CONFIG_PATH,
+    DIFF_WORKERS,
+    REPORT_WRITE_WORKERS,
+    CONTRACT_WORKERS,
+    CONFIG_WORKERS,
     START_TIME,
 )
 from .utils.explorer import (
     get_contract_from_explorer,
+    get_contracts_from_explorer_batch,
     compile_contract_from_explorer,
     parse_compiled_contract,
     get_explorer_hostname,
@@ -21,20 +30,42 @@ from .utils.explorer import (
 from .utils.github import (
     get_file_from_github,
     get_file_from_github_recursive,
+    get_files_from_github_batch,
     resolve_dep,
 )
-from .utils.helpers import create_dirs
+from .utils.diff import (
+    count_diffs_in_pool,
+    make_html_diff_in_pool,
+    make_identical_html,
+    split_lines,
+)
+from .utils.helpers import copy_file, write_file
 from .utils.logger import logger
 from .utils.binary_verifier import deep_match_bytecode
 from .utils.hardhat import hardhat
-from .utils.node_handler import get_bytecode_from_node, get_account, deploy_contract
+from .utils.prettier_pool import prettier_pool
+from .utils.node_handler import (
+    get_bytecode_from_node,
+    get_remote_bytecode,
+    get_account,
+    deploy_contract,
+)
 from .utils.calldata import get_calldata
-from .utils.custom_exceptions import ExceptionHandler, BaseCustomException
+from .utils.custom_exceptions import (
+    ExceptionHandler,
+    BaseCustomException,
+    CacheError,
+)
+from .utils.custom_types import ReportRow
+from .utils.http_cache import CacheSettings, clear_cache
 
 __version__ = "0.0.0"
 
 
 g_skip_user_input: bool = False
+g_hardhat_lock = threading.Lock()
+g_parallel_configs: bool = False
+g_summary_only: bool = False
 
 
 def run_bytecode_diff(
@@ -49,16 +80,21 @@ def run_bytecode_diff(
     address_name = f"{contract_address_from_config} : {contract_name_from_config}"
     logger.divider()
     logger.info(f"Binary bytecode comparison started for {address_name}")
-    target_compiled_contract = compile_contract_from_explorer(contract_source_code)
+
+    # the remote node request doesn't depend on the compilation, overlap them
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        remote_deployed_bytecode_future = executor.submit(
+            logger.bound(get_remote_bytecode),
+            contract_address_from_config,
+            remote_rpc_url,
+        )
+        target_compiled_contract = compile_contract_from_explorer(contract_source_code)
+        remote_deployed_bytecode = remote_deployed_bytecode_future.result()
 
     contract_creation_code, local_compiled_bytecode, immutables = (
         parse_compiled_contract(target_compiled_contract)
     )
 
-    remote_deployed_bytecode = get_bytecode_from_node(
-        contract_address_from_config, remote_rpc_url
-    )
-
     is_fully_matched = local_compiled_bytecode == remote_deployed_bytecode
 
     if is_fully_matched:
@@ -73,15 +109,27 @@ def run_bytecode_diff(
         config["bytecode_comparison"],
     )
 
+    # without constructor arguments a local deployment only fills in the
+    # immutables, which the deep match skips anyway
+    if not calldata:
+        deep_match_bytecode(
+            local_compiled_bytecode,
+            remote_deployed_bytecode,
+            immutables,
+        )
+        return
+
     contract_creation_code += calldata
 
-    local_contract_address = deploy_contract(
-        local_rpc_url, deployer_account, contract_creation_code
-    )
+    # the local Hardhat node and its deployer account are shared by all contracts
+    with g_hardhat_lock:
+        local_contract_address = deploy_contract(
+            local_rpc_url, deployer_account, contract_creation_code
+        )
 
-    local_deployed_bytecode = get_bytecode_from_node(
-        local_contract_address, local_rpc_url
-    )
+        local_deployed_bytecode = get_bytecode_from_node(
+            local_contract_address, local_rpc_url
+        )
 
     is_fully_matched = local_deployed_bytecode == remote_deployed_bytecode
 
@@ -96,6 +144,120 @@ def run_bytecode_diff(
     )
 
 
+def _hash_source(source: str) -> bytes:
+    return hashlib.blake2b(source.encode(), digest_size=16).digest()
+
+
+def _process_one_file(
+    index,
+    path_to_file,
+    source_code,
+    files_count,
+    report_dir,
+    repo,
+    dep_name,
+    github_file,
+    github_api_token,
+    recursive_parsing,
+    prettify,
+    diff_cache,
+    write_executor,
+    report_writes,
+):
+    file_number = index + 1
+    split_path_to_file = path_to_file.split("/")
+    origin = split_path_to_file[0]
+    filename = split_path_to_file[-1]
+
+    # progress is reported for about every 5% of the files
+    if file_number % max(1, files_count // 20) == 0 or file_number == files_count:
+        logger.update_info(f"File {file_number} / {files_count}", filename)
+
+    if not repo:
+        logger.error("File not found", path_to_file)
+        sys.exit()
+
+    file_found = bool(repo)
+
+    # files missing from the batched prefetch are retried one by one
+    if github_file is None and recursive_parsing:
+        github_file = get_file_from_github_recursive(
+            github_api_token, repo, path_to_file, dep_name
+        )
+    elif github_file is None:
+        github_file = get_file_from_github(
+            github_api_token, repo, path_to_file, dep_name
+        )
+
+    if not github_file:
+        github_file = "<!-- No file content -->"
+        file_found = False
+
+    explorer_content = source_code["content"]
+
+    # equal sources stay equal after formatting, only mismatches go to prettier
+    if prettify and github_file != explorer_content:
+        github_file = prettify_solidity(github_file)
+        explorer_content = prettify_solidity(explorer_content)
+
+    # without reports only the number of differing rows is needed
+    if g_summary_only:
+        diffs_count = 0
+        if github_file != explorer_content:
+            diffs_count = count_diffs_in_pool(
+                split_lines(github_file), split_lines(explorer_content)
+            )
+        return ReportRow(file_number, filename, file_found, diffs_count, origin, "")
+
+    diff_report_filename = f"{report_dir}/{filename}.html"
+
+    if github_file == explorer_content:
+        diff_html = make_identical_html(filename, explorer_content)
+        diffs_count = 0
+        report_writes.append(
+            write_executor.submit(write_file, diff_report_filename, diff_html)
+        )
+        return ReportRow(
+            file_number,
+            filename,
+            file_found,
+            diffs_count,
+            origin,
+            diff_report_filename,
+        )
+
+    # contracts of a config often share dependency files, a pair of sources
+    # that was already diffed reuses the report instead of diffing it again
+    diff_key = (_hash_source(github_file), _hash_source(explorer_content))
+    cached_diff = diff_cache.get(diff_key)
+
+    if cached_diff is not None:
+        cached_report_filename, cached_report_write, diffs_count = cached_diff
+        if cached_report_filename != diff_report_filename:
+            cached_report_write.result()
+            copy_file(cached_report_filename, diff_report_filename)
+    else:
+        github_lines = split_lines(github_file)
+        explorer_lines = split_lines(explorer_content)
+        diff_html, diffs_count = make_html_diff_in_pool(github_lines, explorer_lines)
+        report_write = write_executor.submit(
+            write_file, diff_report_filename, diff_html
+        )
+        report_writes.append(report_write)
+        diff_cache.setdefault(
+            diff_key, (diff_report_filename, report_write, diffs_count)
+        )
+
+    return ReportRow(
+        file_number,
+        filename,
+        file_found,
+        diffs_count,
+        origin,
+        diff_report_filename,
+    )
+
+
 def run_source_diff(
     contract_address_from_config,
     contract_code,
@@ -103,7 +265,11 @@ def run_source_diff(
     github_api_token,
     recursive_parsing=False,
     prettify=False,
+    diff_cache=None,
 ):
+    if diff_cache is None:
+        diff_cache = {}
+
     explorer_hostname = get_explorer_hostname(config)
     logger.divider()
     logger.okay("Contract", contract_address_from_config)
@@ -133,89 +299,181 @@ def run_source_diff(
 
     logger.info("Diffing...")
 
-    report = []
-
-    for index, (path_to_file, source_code) in enumerate(source_files):
-        file_number = index + 1
-        split_path_to_file = path_to_file.split("/")
-        origin = split_path_to_file[0]
-        filename = split_path_to_file[-1]
-
-        logger.update_info(f"File {file_number} / { files_count}", filename)
-
-        repo = None
-        dep_name = None
+    # all reports of the contract go to one directory, create it up front
+    report_dir = f"{DIFFS_DIR}/{contract_address_from_config}"
+    if not g_summary_only:
+        os.makedirs(report_dir, exist_ok=True)
 
-        (repo, dep_name) = resolve_dep(path_to_file, config)
+    resolved_deps = {}
+    paths_by_dep = {}
+    for path_to_file, _ in source_files:
+        repo, dep_name = resolve_dep(path_to_file, config)
         if not dep_name:
             repo = config["github_repo"]
-
-        diff_report_filename = None
-        diffs_count = None
-
-        if not repo:
-            logger.error("File not found", path_to_file)
-            sys.exit()
-
-        file_found = bool(repo)
-
-        if recursive_parsing:
-            github_file = get_file_from_github_recursive(
-                github_api_token, repo, path_to_file, dep_name
+        resolved_deps[path_to_file] = (repo, dep_name)
+        paths_by_dep.setdefault(dep_name, []).append(path_to_file)
+
+    report_writes = []
+    with ThreadPoolExecutor(
+        max_workers=REPORT_WRITE_WORKERS
+    ) as write_executor, ThreadPoolExecutor(max_workers=DIFF_WORKERS) as executor:
+        github_files = {}
+        batches = [
+            executor.submit(
+                logger.bound(get_files_from_github_batch),
+                github_api_token,
+                resolved_deps[paths_to_files[0]][0],
+                paths_to_files,
+                dep_name,
             )
-        else:
-            github_file = get_file_from_github(
-                github_api_token, repo, path_to_file, dep_name
+            for dep_name, paths_to_files in paths_by_dep.items()
+            if resolved_deps[paths_to_files[0]][0]
+        ]
+        for batch in batches:
+            github_files.update(batch.result())
+
+        report = list(
+            executor.map(
+                logger.bound(lambda args: _process_one_file(*args)),
+                [
+                    (
+                        index,
+                        path_to_file,
+                        source_code,
+                        files_count,
+                        report_dir,
+                        *resolved_deps[path_to_file],
+                        github_files.get(path_to_file),
+                        github_api_token,
+                        recursive_parsing,
+                        prettify,
+                        diff_cache,
+                        write_executor,
+                        report_writes,
+                    )
+                    for index, (path_to_file, source_code) in enumerate(source_files)
+                ],
             )
+        )
 
-        if not github_file:
-            github_file = "<!-- No file content -->"
-            file_found = False
-
-        explorer_content = source_code["content"]
-
-        if prettify:
-            github_file = prettify_solidity(github_file)
-            explorer_content = prettify_solidity(explorer_content)
+    for report_write in report_writes:
+        report_write.result()
 
-        github_lines = github_file.splitlines()
-        explorer_lines = explorer_content.splitlines()
+    logger.divider()
 
-        diff_html = difflib.HtmlDiff().make_file(github_lines, explorer_lines)
-        diff_report_filename = (
-            f"{DIFFS_DIR}/{contract_address_from_config}/{filename}.html"
-        )
+    files_found = 0
+    identical_files = 0
+    for row in report:
+        files_found += row.file_found
+        identical_files += row.diffs_count == 0
 
-        create_dirs(diff_report_filename)
-        with open(diff_report_filename, "w") as f:
-            f.write(diff_html)
+    logger.info(f"Files found: {files_found} / {files_count}")
+    logger.info(f"Identical files: {identical_files} / {files_found}")
 
-        diffs = difflib.unified_diff(github_lines, explorer_lines)
-        diffs_count = len(list(diffs))
+    logger.report_table(report)
 
-        report_data = [
-            file_number,
-            filename,
-            file_found,
-            diffs_count,
-            origin,
-            diff_report_filename,
-        ]
 
-        report.append(report_data)
+def _process_one_contract(
+    contract_address,
+    contract_name,
+    prefetched_contract,
+    config,
+    explorer_token,
+    github_api_token,
+    recursive_parsing,
+    unify_formatting,
+    enable_binary_comparison,
+    deployer_account,
+    local_rpc_url,
+    remote_rpc_url,
+    diff_cache,
+    buffer_output,
+):
+    with logger.buffered() if buffer_output else contextlib.nullcontext():
+        _diff_contract(
+            contract_address,
+            contract_name,
+            prefetched_contract,
+            config,
+            explorer_token,
+            github_api_token,
+            recursive_parsing,
+            unify_formatting,
+            enable_binary_comparison,
+            deployer_account,
+            local_rpc_url,
+            remote_rpc_url,
+            diff_cache,
+        )
 
-    logger.divider()
 
-    files_found = len([row for row in report if row[2]])
-    logger.info(f"Files found: {files_found} / {files_count}")
+def _diff_contract(
+    contract_address,
+    contract_name,
+    prefetched_contract,
+    config,
+    explorer_token,
+    github_api_token,
+    recursive_parsing,
+    unify_formatting,
+    enable_binary_comparison,
+    deployer_account,
+    local_rpc_url,
+    remote_rpc_url,
+    diff_cache,
+):
+    try:
+        contract_code = get_contract_from_explorer(
+            explorer_token,
+            get_explorer_hostname(config),
+            contract_address,
+            contract_name,
+            prefetched_contract,
+        )
+        run_source_diff(
+            contract_address,
+            contract_code,
+            config,
+            github_api_token,
+            recursive_parsing,
+            unify_formatting,
+            diff_cache,
+        )
+        if enable_binary_comparison:
+            run_bytecode_diff(
+                contract_address,
+                contract_name,
+                contract_code,
+                config,
+                deployer_account,
+                local_rpc_url,
+                remote_rpc_url,
+            )
+    except BaseCustomException as custom_exc:
+        ExceptionHandler.raise_exception_or_log(custom_exc)
+        traceback.print_exc()
 
-    identical_files = len([row for row in report if row[3] == 0])
-    logger.info(f"Identical files: {identical_files} / {files_found}")
 
-    logger.report_table(report)
+def process_config(
+    path: str,
+    hardhat_config_path: str,
+    recursive_parsing: bool,
+    unify_formatting: bool,
+    enable_binary_comparison: bool,
+):
+    # with configs processed in parallel, everything a config logs (its
+    # contracts included) is written out at once when it is done
+    with logger.buffered() if g_parallel_configs else contextlib.nullcontext():
+        _diff_config(
+            path,
+            hardhat_config_path,
+            recursive_parsing,
+            unify_formatting,
+            enable_binary_comparison,
+        )
 
 
-def process_config(
+def _diff_config(
     path: str,
     hardhat_config_path: str,
     recursive_parsing: bool,
@@ -244,6 +502,9 @@ def process_config(
     if not github_api_token:
         raise ValueError("GITHUB_API_TOKEN variable is not set")
 
+    local_rpc_url = None
+    remote_rpc_url = None
+    deployer_account = None
     if enable_binary_comparison:
         if "bytecode_comparison" not in config:
             raise ValueError(f'Failed to find "bytecode_comparison" section in config')
@@ -262,35 +523,50 @@ def process_config(
             )
             deployer_account = get_account(local_rpc_url)
 
-        for contract_address, contract_name in config["contracts"].items():
+        contracts = config["contracts"]
+        # each contract is confirmed before it is diffed unless --yes is given,
+        # so only then are they processed in parallel
+        max_workers = CONTRACT_WORKERS if g_skip_user_input else 1
+        max_workers = max(1, min(max_workers, len(contracts)))
+
+        prefetched_contracts = get_contracts_from_explorer_batch(
+            explorer_token, get_explorer_hostname(config), contracts.keys()
+        )
+
+        diff_cache = {}
+
+        def process_contract(contract):
+            _process_one_contract(
+                *contract,
+                prefetched_contracts.get(contract[0]),
+                config,
+                explorer_token,
+                github_api_token,
+                recursive_parsing,
+                unify_formatting,
+                enable_binary_comparison,
+                deployer_account,
+                local_rpc_url,
+                remote_rpc_url,
+                diff_cache,
+                max_workers > 1 or g_parallel_configs,
+            )
+
+        if max_workers == 1:
+            # in the calling thread, so Ctrl-C also interrupts the confirmation prompt
+            for contract in contracts.items():
+                process_contract(contract)
+        else:
+            executor = ThreadPoolExecutor(max_workers=max_workers)
             try:
-                contract_code = get_contract_from_explorer(
-                    explorer_token,
-                    get_explorer_hostname(config),
-                    contract_address,
-                    contract_name,
-                )
-                run_source_diff(
-                    contract_address,
-                    contract_code,
-                    config,
-                    github_api_token,
-                    recursive_parsing,
-                    unify_formatting,
-                )
-                if enable_binary_comparison:
-                    run_bytecode_diff(
-                        contract_address,
-                        contract_name,
-                        contract_code,
-                        config,
-                        deployer_account,
-                        local_rpc_url,
-                        remote_rpc_url,
-                    )
-            except BaseCustomException as custom_exc:
-                ExceptionHandler.raise_exception_or_log(custom_exc)
-                traceback.print_exc()
+                for _ in executor.map(
+                    logger.bound(process_contract), contracts.items()
+                ):
+                    pass
+            finally:
+                # queued contracts are dropped, the running ones still use the
+                # Hardhat node and finish before it is stopped
+                executor.shutdown(cancel_futures=True)
     except KeyboardInterrupt:
         logger.info(f"Keyboard interrupt by user")
 
@@ -299,6 +575,50 @@ def process_config(
             hardhat.stop()
 
 
+def process_configs(
+    paths: list[str],
+    hardhat_config_path: str,
+    recursive_parsing: bool,
+    unify_formatting: bool,
+    enable_binary_comparison: bool,
+):
+    global g_parallel_configs
+
+    # every config starts its own Hardhat node on the same port, and contracts
+    # are confirmed one by one unless --yes is given
+    max_workers = CONFIG_WORKERS
+    if enable_binary_comparison or not g_skip_user_input:
+        max_workers = 1
+    max_workers = max(1, min(max_workers, len(paths)))
+    g_parallel_configs = max_workers > 1
+
+    def process_one_config(path):
+        process_config(
+            path,
+            hardhat_config_path,
+            recursive_parsing,
+            unify_formatting,
+            enable_binary_comparison,
+        )
+
+    if max_workers == 1:
+        for path in paths:
+            process_one_config(path)
+        return
+
+    wait_for_workers = True
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for _ in executor.map(process_one_config, paths):
+            pass
+    except KeyboardInterrupt:
+        # running configs can't be interrupted, don't wait for them
+        wait_for_workers = False
+        logger.info(f"Keyboard interrupt by user")
+    finally:
+        executor.shutdown(wait=wait_for_workers, cancel_futures=True)
+
+
 def parse_arguments():
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -329,6 +649,27 @@ def parse_arguments():
         help="Unify formatting by prettier before comparing",
         action="store_true",
     )
+    parser.add_argument(
+        "--quiet",
+        "-q",
+        help="Only print warnings, errors and reports",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--summary",
+        help="Only count the differences of each file, without writing HTML reports",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--refresh",
+        help="Ignore cached GitHub and explorer responses and compiled contracts, fetch and compile them again",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--clear-cache",
+        help="Remove all cached responses and compiled contracts before running",
+        action="store_true",
+    )
     parser.add_argument(
         "--enable-binary-comparison",
         "-B",
@@ -339,45 +680,58 @@ def parse_arguments():
 
 
 def main():
-    global g_skip_user_input
+    global g_skip_user_input, g_summary_only
 
     args = parse_arguments()
-    g_skip_user_input = args.yes
     if args.version:
         print(f"Diffyscan {__version__}")
         return
+    g_skip_user_input = args.yes
+    g_summary_only = args.summary
+    logger.quiet = args.quiet
+    try:
+        CacheSettings.initialize(args.refresh)
+    except CacheError as e:
+        logger.error(e.message)
+        sys.exit(1)
+    if args.clear_cache:
+        clear_cache()
     logger.info("Welcome to Diffyscan!")
     logger.divider()
-    if args.path is None:
-        process_config(
-            DEFAULT_CONFIG_PATH,
-            args.hardhat_path,
-            args.support_brownie,
-            args.prettify,
-            args.enable_binary_comparison,
-        )
-    elif os.path.isfile(args.path):
-        process_config(
-            args.path,
-            args.hardhat_path,
-            args.support_brownie,
-            args.prettify,
-            args.enable_binary_comparison,
-        )
-    elif os.path.isdir(args.path):
-        for filename in os.listdir(args.path):
-            config_path = os.path.join(args.path, filename)
-            if os.path.isfile(config_path):
-                process_config(
-                    config_path,
-                    args.hardhat_path,
-                    args.support_brownie,
-                    args.prettify,
-                    args.enable_binary_comparison,
+    try:
+        if args.path is None:
+            process_config(
+                DEFAULT_CONFIG_PATH,
+                args.hardhat_path,
+                args.support_brownie,
+                args.prettify,
+                args.enable_binary_comparison,
+            )
+        elif os.path.isfile(args.path):
+            process_config(
+                args.path,
+                args.hardhat_path,
+                args.support_brownie,
+                args.prettify,
+                args.enable_binary_comparison,
+            )
+        elif os.path.isdir(args.path):
+            with os.scandir(args.path) as entries:
+                config_paths = sorted(
+                    entry.path for entry in entries if entry.is_file()
                 )
-    else:
-        logger.error(f"Specified config path {args.path} not found")
-        sys.exit(1)
+            process_configs(
+                config_paths,
+                args.hardhat_path,
+                args.support_brownie,
+                args.prettify,
+                args.enable_binary_comparison,
+            )
+        else:
+            logger.error(f"Specified config path {args.path} not found")
+            sys.exit(1)
+    finally:
+        prettier_pool.stop()
 
     execution_time = time.time() - START_TIME
 
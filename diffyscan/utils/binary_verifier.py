@@ -1,8 +1,9 @@
-import itertools
+from array import array
 
 from .logger import logger, bgYellow, bgRed, bgGreen, red, green, to_hex
-from .constants import OPCODES, PUSH0, PUSH32
+from .constants import OPCODE_NAMES, KNOWN_OPCODES, INSTRUCTION_LENGTHS
 from .custom_exceptions import BinVerifierError
+from .custom_types import ParsedBytecode
 
 
 def format_bytecode(bytecode):
@@ -32,15 +33,27 @@ def deep_match_bytecode(
     if actual_trimmed_bytecode["metadata"] or expected_trimmed_bytecode["metadata"]:
         logger.info("Metadata has been detected and trimmed")
 
-    actual_instructions, unknown_opcodes_first_half = parse(
-        actual_trimmed_bytecode["bytecode"]
-    )
-    expected_instructions, unknown_opcodes_second_half = parse(
-        expected_trimmed_bytecode["bytecode"]
-    )
+    actual_code = _to_bytes(actual_trimmed_bytecode["bytecode"])
+    expected_code = _to_bytes(expected_trimmed_bytecode["bytecode"])
+
+    # codes that only differ in the metadata or on the immutable reference
+    # positions don't need the instruction by instruction comparison
+    if actual_code == expected_code:
+        logger.okay(f"Bytecodes are fully matched without metadata")
+        return
+    if len(actual_code) == len(expected_code) and _mask_immutables(
+        actual_code, immutables
+    ) == _mask_immutables(expected_code, immutables):
+        logger.okay(
+            f"Bytecodes have differences only on the immutable reference position"
+        )
+        return
+
+    actual_instructions = parse(actual_code)
+    expected_instructions = parse(expected_code)
 
     unknown_opcodes = (
-        unknown_opcodes_first_half or set() | unknown_opcodes_second_half or set()
+        actual_instructions.unknown_opcodes | expected_instructions.unknown_opcodes
     )
     if unknown_opcodes:
         logger.warn(f"Detected unknown opcodes: {unknown_opcodes}")
@@ -48,18 +61,17 @@ def deep_match_bytecode(
     if len(actual_instructions) != len(expected_instructions):
         logger.warn(f"Codes have a different length")
 
-    zipped_instructions = list(
-        itertools.zip_longest(actual_instructions, expected_instructions)
-    )
-
-    is_mismatch = (
-        lambda pair: pair[0] is None
-        or pair[1] is None
-        or pair[0].get("bytecode") != pair[1].get("bytecode")
-    )
+    # instructions are compared as raw bytes, past the end of the shorter code
+    # every instruction is a mismatch
+    instructions_count = max(len(actual_instructions), len(expected_instructions))
+    common_count = min(len(actual_instructions), len(expected_instructions))
     mismatches = [
-        index for index, pair in enumerate(zipped_instructions) if is_mismatch(pair)
+        index
+        for index in range(common_count)
+        if actual_instructions.instruction(index)
+        != expected_instructions.instruction(index)
     ]
+    mismatches.extend(range(common_count, instructions_count))
 
     near_lines_count = 3  # context depth, i.e., the number of lines above and \below to be displayed for each diff
 
@@ -73,7 +85,7 @@ def deep_match_bytecode(
 
     for ind in list(checkpoints):
         start_index = max(0, ind - near_lines_count)
-        end_index = min(ind + near_lines_count, len(zipped_instructions) - 1)
+        end_index = min(ind + near_lines_count, instructions_count - 1)
 
         checkpoints.update(range(start_index, end_index + 1))
 
@@ -97,31 +109,33 @@ def deep_match_bytecode(
     logger.divider()
 
     is_matched_with_excluded_immutables = True
+    # the listing is written out at once rather than a print per instruction
+    lines = []
     for previous_index, current_index in zip(checkpoints, checkpoints[1:]):
         if previous_index != current_index - 1:
-            print("...")
+            lines.append("...")
 
         actual = (
-            actual_instructions[current_index]
+            _describe_instruction(actual_instructions, current_index)
             if current_index < len(actual_instructions)
             else None
         )
         expected = (
-            expected_instructions[current_index]
+            _describe_instruction(expected_instructions, current_index)
             if current_index < len(expected_instructions)
             else None
         )
 
         if not actual and expected:
             params = "0x" + expected["bytecode"][2:]
-            print(
+            lines.append(
                 red(
                     f'{to_hex(current_index, 4)} {to_hex(expected["op"]["code"])} {expected["op"]["name"]} {params}'
                 )
             )
         elif actual and not expected:
             params = "0x" + actual["bytecode"][2:]
-            print(
+            lines.append(
                 green(
                     f'{to_hex(current_index, 4)} {to_hex(actual["op"]["code"])} {actual["op"]["name"]} {params}'
                 )
@@ -156,10 +170,14 @@ def deep_match_bytecode(
                     else bgRed(actual_params) + " " + bgGreen(expected_params)
                 )
             )
-            print(f"{to_hex(current_index, 4)} {opcode} {opname} {params}")
+            lines.append(f"{to_hex(current_index, 4)} {opcode} {opname} {params}")
         else:
+            logger.stdout("\n".join(lines))
             raise BinVerifierError("Invalid bytecode difference data")
 
+    if lines:
+        logger.stdout("\n".join(lines))
+
     if not is_matched_with_excluded_immutables:
         raise BinVerifierError(
             f"Bytecodes have differences not on the immutable reference position"
@@ -168,23 +186,38 @@ def deep_match_bytecode(
     logger.okay(f"Bytecodes have differences only on the immutable reference position")
 
 
-def parse(bytecode):
-    buffer = bytes.fromhex(bytecode[2:] if bytecode.startswith("0x") else bytecode)
-    instructions = []
+def _to_bytes(bytecode: str) -> bytes:
+    return bytes.fromhex(bytecode[2:] if bytecode.startswith("0x") else bytecode)
+
+
+def _mask_immutables(code: bytes, immutables: dict) -> bytes:
+    masked = bytearray(code)
+    for start, length in immutables.items():
+        masked[start : start + length] = bytes(len(masked[start : start + length]))
+    return bytes(masked)
+
+
+def _describe_instruction(instructions: ParsedBytecode, index: int) -> dict:
+    # only the printed instructions are turned into the dicts used for output
+    instruction = instructions.instruction(index)
+    opcode = instruction[0]
+    return {
+        "start": instructions.start(index),
+        "length": len(instruction),
+        "op": {"name": OPCODE_NAMES[opcode], "code": opcode},
+        "bytecode": instruction.hex(),
+    }
+
+
+def parse(bytecode: str | bytes) -> ParsedBytecode:
+    buffer = bytecode if isinstance(bytecode, bytes) else _to_bytes(bytecode)
+    starts = array("I")
     i = 0
     unknown_opcodes = set()
     while i < len(buffer):
         opcode = buffer[i]
-        if opcode not in OPCODES:
+        if not KNOWN_OPCODES[opcode]:
             unknown_opcodes.add(hex(opcode))
-        length = 1 + (opcode - PUSH0 if PUSH0 <= opcode <= PUSH32 else 0)
-        instructions.append(
-            {
-                "start": i,
-                "length": length,
-                "op": {"name": OPCODES.get(opcode, "INVALID"), "code": opcode},
-                "bytecode": buffer[i : i + length].hex(),
-            }
-        )
-        i += length
-    return instructions, unknown_opcodes
+        starts.append(i)
+        i += INSTRUCTION_LENGTHS[opcode]
+    return ParsedBytecode(buffer, starts, unknown_opcodes)
@@ -1,16 +1,89 @@
+import contextlib
+import functools
+import hashlib
 import json
 import os
 import sys
-import subprocess
-import tempfile
+import threading
+import time
 import requests
-import uuid
 
 from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from .logger import logger
+from .constants import (
+    HTTP_POOL_SIZE,
+    GITHUB_MAX_REQUESTS,
+    EXPLORER_MAX_REQUESTS,
+    EXPLORER_REQUEST_INTERVAL,
+)
 from .custom_types import Config
 from .custom_exceptions import NodeError, ExplorerError
+from .prettier_pool import prettier_pool
+from .http_cache import get_cached, put_cached
+
+
+def _create_session():
+    # one keep-alive connection pool for every GitHub, explorer and node request;
+    # idempotent requests are retried on rate limits and gateway errors
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_SIZE,
+        pool_maxsize=HTTP_POOL_SIZE,
+        max_retries=Retry(
+            total=5, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504]
+        ),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+session = _create_session()
+
+
+class RequestLimiter:
+    # at most max_requests in flight, started at least min_interval apart
+    def __init__(self, max_requests: int, min_interval: float = 0):
+        self.semaphore = threading.BoundedSemaphore(max_requests)
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.next_start = 0.0
+
+    @contextlib.contextmanager
+    def slot(self):
+        with self.semaphore:
+            if self.min_interval:
+                with self.lock:
+                    now = time.monotonic()
+                    start = max(now, self.next_start)
+                    self.next_start = start + self.min_interval
+                time.sleep(start - now)
+            yield
+
+
+# contracts, their files and configs are processed concurrently, the limiters
+# keep the requests of all of them within what the hosts tolerate
+_github_limiter = RequestLimiter(GITHUB_MAX_REQUESTS)
+_host_limiters = {}
+_host_limiters_lock = threading.Lock()
+
+
+def request_slot(url):
+    hostname = urlparse(url).hostname or ""
+    # every GitHub host counts against the same account limits
+    if hostname == "github.com" or hostname.endswith(
+        (".github.com", ".githubusercontent.com")
+    ):
+        return _github_limiter.slot()
+    with _host_limiters_lock:
+        if hostname not in _host_limiters:
+            _host_limiters[hostname] = RequestLimiter(
+                EXPLORER_MAX_REQUESTS, EXPLORER_REQUEST_INTERVAL
+            )
+        return _host_limiters[hostname].slot()
 
 
 def load_env(variable_name, required=True, masked=False):
@@ -31,14 +104,36 @@ def load_env(variable_name, required=True, masked=False):
 
 
 def load_config(path: str) -> Config:
+    return _load_config_cached(path, os.path.getmtime(path))
+
+
+@functools.lru_cache(maxsize=128)
+def _load_config_cached(path: str, mtime: float) -> Config:
     with open(path, mode="r") as config_file:
-        return json.load(config_file)
+        config = json.load(config_file)
+    validate_config(config, path)
+    return config
+
+
+def validate_config(config: Config, path: str):
+    for key in ("contracts", "github_repo", "dependencies"):
+        if key not in config:
+            raise ValueError(f'Failed to find "{key}" section in config {path}')
+
+    repos = {"github_repo": config["github_repo"], **config["dependencies"]}
+    for repo_name, repo in repos.items():
+        for key in ("url", "commit", "relative_root"):
+            if key not in repo:
+                raise ValueError(
+                    f'Failed to find "{key}" of "{repo_name}" in config {path}'
+                )
 
 
 def fetch(url, headers=None):
     logger.log(f"Fetch: {url}")
     try:
-        response = requests.get(url, headers=headers)
+        with request_slot(url):
+            response = session.get(url, headers=headers)
         response.raise_for_status()
     except requests.exceptions.HTTPError as http_err:
         raise ExplorerError(f"HTTP error occurred: {http_err}")
@@ -55,7 +150,7 @@ def fetch(url, headers=None):
 def pull(url, payload=None, headers=None):
     logger.log(f"Pull: {url}")
     try:
-        response = requests.post(url, data=payload, headers=headers)
+        response = session.post(url, data=payload, headers=headers)
         response.raise_for_status()
     except requests.exceptions.HTTPError as http_err:
         raise NodeError(f"HTTP error occurred: {http_err}")
@@ -82,23 +177,41 @@ def parse_repo_link(repo_link):
     return user_slash_repo
 
 
+# prettified sources by sha256 of the original text, the same dependency files
+# show up in many contracts of a config
+_prettified_sources = {}
+
+
+@functools.cache
+def _get_prettier_version() -> str | None:
+    # prettier and the plugin are taken from the working directory, their
+    # versions are part of the disk cache key, so an upgrade reformats everything
+    versions = []
+    for package in ("prettier", "prettier-plugin-solidity"):
+        try:
+            with open(os.path.join("node_modules", package, "package.json")) as f:
+                versions.append(json.load(f)["version"])
+        except (OSError, ValueError, KeyError):
+            return None
+    return "|".join(versions)
+
+
 def prettify_solidity(solidity_contract_content: str):
-    github_file_name = os.path.join(tempfile.gettempdir(), f"{uuid.uuid4()}.sol")
-    with open(github_file_name, "w") as fp:
-        fp.write(solidity_contract_content)
-
-    prettier_return_code = subprocess.call(
-        [
-            "npx",
-            "prettier",
-            "--plugin=prettier-plugin-solidity",
-            "--write",
-            github_file_name,
-        ],
-        stdout=subprocess.DEVNULL,
-    )
-    if prettier_return_code != 0:
-        logger.error("Prettier/npx subprocess failed (see the error above)")
-        sys.exit()
-    with open(github_file_name, "r") as fp:
-        return fp.read()
+    content_hash = hashlib.sha256(solidity_contract_content.encode()).hexdigest()
+    if content_hash in _prettified_sources:
+        return _prettified_sources[content_hash]
+
+    # without known versions the result is only kept for this run
+    prettier_version = _get_prettier_version()
+    cache_key = f"prettier|{prettier_version}|{content_hash}"
+    cached = get_cached(cache_key) if prettier_version else None
+
+    if cached:
+        formatted = cached["body"]
+    else:
+        formatted = prettier_pool.format(solidity_contract_content)
+        if prettier_version:
+            put_cached(cache_key, formatted)
+
+    _prettified_sources[content_hash] = formatted
+    return formatted
@@ -5,6 +5,7 @@ import json
 import os
 import stat
 import sys
+import threading
 
 from .common import fetch
 from .helpers import create_dirs
@@ -73,6 +74,19 @@ def set_compiler_executable(compiler_path):
     os.chmod(compiler_path, compiler_file_rights.st_mode | stat.S_IEXEC)
 
 
+# contracts are compiled concurrently, a build is downloaded by one of them
+# while the others wait instead of running a half-written binary
+_compiler_locks = {}
+_compiler_locks_lock = threading.Lock()
+
+
+def compiler_lock(compiler_path):
+    with _compiler_locks_lock:
+        if compiler_path not in _compiler_locks:
+            _compiler_locks[compiler_path] = threading.Lock()
+        return _compiler_locks[compiler_path]
+
+
 def prepare_compiler(required_platform, build_info, compiler_path):
     create_dirs(compiler_path)
     compiler_binary = download_compiler(required_platform, build_info, compiler_path)
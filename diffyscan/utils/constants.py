@@ -9,8 +9,43 @@ DIFFS_DIR = f"{DIGEST_DIR}/{START_TIME_INT}/diffs"
 LOGS_PATH = f"{DIGEST_DIR}/{START_TIME_INT}/logs.txt"
 DEFAULT_CONFIG_PATH = "config.json"
 DEFAULT_HARDHAT_CONFIG_PATH = "hardhat_config.js"
+DIFF_WORKERS = int(os.getenv("DIFFYSCAN_WORKERS", "16"))
+CONTRACT_WORKERS = int(os.getenv("DIFFYSCAN_CONTRACT_WORKERS", "8"))
+CONFIG_WORKERS = int(os.getenv("DIFFYSCAN_CONFIG_WORKERS", "4"))
+REPORT_WRITE_WORKERS = 4
+PRETTIER_WORKERS = os.cpu_count() or 1
+DIFF_PROCESSES = int(os.getenv("DIFFYSCAN_DIFF_PROCESSES", str(os.cpu_count() or 1)))
+# smaller diffs take less than pickling the lines to a process and back
+PROCESS_DIFF_MIN_LINES = 2000
+LARGE_DIFF_SIZE = 200_000
+NO_AUTOJUNK_MAX_LINES = 2000
+# lines of a changed block at least this similar are shown as one changed row,
+# as in ndiff; blocks with more line pairs than the max are paired by position
+SIMILAR_LINES_CUTOFF = 0.75
+SIMILAR_LINES_MAX_PAIRS = 40_000
+WRITE_BUFFER_SIZE = 1 << 20
+
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+GITHUB_GRAPHQL_BATCH_SIZE = 50
+ETHERSCAN_BATCH_SIZE = 5
+HTTP_POOL_SIZE = 32
+# requests in flight at once, GitHub counts them against the secondary rate
+# limits, explorers allow only a few calls per second per key
+GITHUB_MAX_REQUESTS = 8
+EXPLORER_MAX_REQUESTS = 2
+EXPLORER_REQUEST_INTERVAL = 0.25
+EXPLORER_RATE_LIMIT_RETRIES = 5
 
 SOLC_DIR = os.path.join(tempfile.gettempdir(), "solc_builds")
+# the cache is trusted without revalidation, so it lives in the user's own
+# cache directory rather than in the shared temp directory
+CACHE_DIR = os.getenv(
+    "DIFFYSCAN_CACHE_DIR",
+    os.path.join(
+        os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+        "diffyscan",
+    ),
+)
 
 # fmt: off
 OPCODES = {
@@ -55,3 +90,10 @@ def get_key_from_value(dictionary: dict, value: str):
 
 PUSH0 = get_key_from_value(OPCODES, "PUSH0")
 PUSH32 = get_key_from_value(OPCODES, "PUSH32")
+
+# lookup tables indexed directly by the opcode byte
+OPCODE_NAMES = tuple(OPCODES.get(i, "INVALID") for i in range(256))
+KNOWN_OPCODES = bytes(1 if i in OPCODES else 0 for i in range(256))
+INSTRUCTION_LENGTHS = bytes(
+    1 + (i - PUSH0) if PUSH0 <= i <= PUSH32 else 1 for i in range(256)
+)
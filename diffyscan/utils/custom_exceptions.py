@@ -44,6 +44,16 @@ class BinVerifierError(BaseCustomException):
         super().__init__(f"Failed in binary comparison: {reason}")
 
 
+class PrettierError(BaseCustomException):
+    def __init__(self, reason: str):
+        super().__init__(f"Failed to format with prettier: {reason}")
+
+
+class CacheError(BaseCustomException):
+    def __init__(self, reason: str):
+        super().__init__(f"Failed to use the cache directory: {reason}")
+
+
 class ExceptionHandler:
     raise_exception = True
 
@@ -1,3 +1,5 @@
+from array import array
+from dataclasses import dataclass
 from typing import TypedDict
 
 
@@ -16,3 +18,32 @@ class Config(TypedDict):
     explorer_token_env_var: str
     bytecode_comparison: BinartConfig
     fail_on_comparison_error: bool
+
+
+@dataclass(slots=True, frozen=True)
+class ReportRow:
+    file_number: int
+    filename: str
+    file_found: bool
+    diffs_count: int
+    origin: str
+    diff_report_filename: str
+
+
+@dataclass(slots=True, frozen=True)
+class ParsedBytecode:
+    # instructions are kept as their offsets into the code, the bytes, names
+    # and hex of an instruction are only looked up when they are needed
+    code: bytes
+    starts: array
+    unknown_opcodes: set[str]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def start(self, index: int) -> int:
+        return self.starts[index]
+
+    def instruction(self, index: int) -> bytes:
+        end = self.starts[index + 1] if index + 1 < len(self.starts) else len(self.code)
+        return self.code[self.starts[index] : end]
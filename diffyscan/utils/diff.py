@@ -0,0 +1,351 @@
+import difflib
+import html
+import multiprocessing
+import sys
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from cydifflib import SequenceMatcher as CSequenceMatcher
+except ImportError:
+    try:
+        from cdifflib import CSequenceMatcher
+    except ImportError:
+        CSequenceMatcher = None
+
+try:
+    from diff_match_patch import diff_match_patch
+except ImportError:
+    diff_match_patch = None
+
+from .constants import (
+    DIFF_PROCESSES,
+    LARGE_DIFF_SIZE,
+    NO_AUTOJUNK_MAX_LINES,
+    PROCESS_DIFF_MIN_LINES,
+    SIMILAR_LINES_CUTOFF,
+    SIMILAR_LINES_MAX_PAIRS,
+)
+
+# the C implementation if installed, it gives the same opcodes as difflib's
+SequenceMatcher = CSequenceMatcher or difflib.SequenceMatcher
+
+_thread_local = threading.local()
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+IDENTICAL_HTML_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+    <meta http-equiv="Content-Type" content="text/html; charset=utf-8" />
+    <title>{filename}</title>
+</head>
+<body>
+    <p><b>Files are identical</b></p>
+    <pre>{content}</pre>
+</body>
+</html>
+"""
+
+
+# the styles and legend around the table are the same for every report
+_FILE_HEAD, _FILE_TAIL = (
+    part
+    % dict(
+        styles=difflib.HtmlDiff._styles,
+        legend=difflib.HtmlDiff._legend,
+        charset="utf-8",
+    )
+    for part in difflib.HtmlDiff._file_template.split("%(table)s")
+)
+
+
+_ROW_TEMPLATE = (
+    '            <tr><td class="diff_next"%s>%s</td>%s'
+    '<td class="diff_next">%s</td>%s</tr>\n'
+)
+
+
+def _replace_markup(row: str) -> str:
+    return (
+        row.replace("\0+", '<span class="diff_add">')
+        .replace("\0-", '<span class="diff_sub">')
+        .replace("\0^", '<span class="diff_chg">')
+        .replace("\1", "</span>")
+        .replace("\t", "&nbsp;")
+    )
+
+
+class CountingHtmlDiff(difflib.HtmlDiff):
+    # renders the table from the opcodes of a single line-level SequenceMatcher
+    # pass instead of ndiff, and counts the differing rows of the last table
+    diffs_count = 0
+
+    def make_file_parts(self, fromlines, tolines) -> list[str]:
+        # same document as make_file, but as a list of rows that is written
+        # out as is, the table is never joined into one big string
+        return [_FILE_HEAD, *self.make_table_parts(fromlines, tolines), _FILE_TAIL]
+
+    def make_table_parts(self, fromlines, tolines) -> list[str]:
+        # make_table without context and headers, except that the markup
+        # markers are replaced row by row instead of in five copies of the table
+        self._make_prefix()
+        # _collect_lines reads the rows prepared by _tab_newline_replace
+        self._tab_newline_replace(fromlines, tolines)
+        fromlist, tolist, flaglist = self._collect_lines(None)
+        fromlist, tolist, flaglist, next_href, next_id = self._convert_flags(
+            fromlist, tolist, flaglist, False, 5
+        )
+
+        table_head, table_tail = self._table_template.split("%(data_rows)s")
+        values = dict(header_row="", prefix=self._prefix[1])
+        parts = [table_head % values]
+        # the opcode rows have no context separators (None flags) to skip
+        for i in range(len(flaglist)):
+            parts.append(
+                _replace_markup(
+                    _ROW_TEMPLATE
+                    % (next_id[i], next_href[i], fromlist[i], next_href[i], tolist[i])
+                )
+            )
+        parts.append(table_tail % values)
+        return parts
+
+    def _tab_newline_replace(self, fromlines, tolines):
+        fromlines, tolines = super()._tab_newline_replace(fromlines, tolines)
+        self._opcode_rows = _opcode_rows(fromlines, tolines)
+        return fromlines, tolines
+
+    def _collect_lines(self, diffs):
+        # diffs is the lazy ndiff-based iterator of make_table, it is never run
+        fromlist, tolist, flaglist = super()._collect_lines(self._opcode_rows)
+        self.diffs_count = sum(1 for flag in flaglist if flag)
+        return fromlist, tolist, flaglist
+
+
+def _opcode_rows(fromlines, tolines):
+    # yields side by side rows in the format of difflib._mdiff
+    for tag, i1, i2, j1, j2 in _get_opcodes(fromlines, tolines):
+        if tag == "equal":
+            for i, j in zip(range(i1, i2), range(j1, j2)):
+                yield (i + 1, fromlines[i]), (j + 1, tolines[j]), False
+            continue
+
+        for i, j, similar in _pair_lines(fromlines, i1, i2, tolines, j1, j2):
+            if similar and fromlines[i] == tolines[j]:
+                yield (i + 1, fromlines[i]), (j + 1, tolines[j]), False
+            elif similar:
+                fromline, toline = _mark_changed_chars(fromlines[i], tolines[j])
+                yield (i + 1, fromline), (j + 1, toline), True
+            else:
+                fromside = toside = ("", "\n")
+                if i is not None:
+                    fromside = (i + 1, _whole_line("-", fromlines[i]))
+                if j is not None:
+                    toside = (j + 1, _whole_line("+", tolines[j]))
+                yield fromside, toside, True
+
+
+def _whole_line(marker, line):
+    # like _mdiff, a blank line gets a space so the highlight is visible
+    return f"\0{marker}{line or ' '}\1"
+
+
+def _pair_lines(fromlines, i1, i2, tolines, j1, j2):
+    # yields the (i, j, similar) rows of a changed block, i or j is None on the
+    # side without a line; like ndiff, the most similar pair of lines is shown
+    # as one changed row and the lines around it are paired the same way, the
+    # rest are removed and added side by side
+    best = None
+    if (i2 - i1) * (j2 - j1) <= SIMILAR_LINES_MAX_PAIRS:
+        best_ratio = SIMILAR_LINES_CUTOFF
+        matcher = SequenceMatcher()
+        for j in range(j1, j2):
+            matcher.set_seq2(tolines[j])
+            for i in range(i1, i2):
+                matcher.set_seq1(fromlines[i])
+                if (
+                    matcher.real_quick_ratio() > best_ratio
+                    and matcher.quick_ratio() > best_ratio
+                ):
+                    ratio = matcher.ratio()
+                    if ratio > best_ratio:
+                        best_ratio = ratio
+                        best = i, j
+
+    if best is None:
+        for k in range(max(i2 - i1, j2 - j1)):
+            i = i1 + k if i1 + k < i2 else None
+            j = j1 + k if j1 + k < j2 else None
+            yield i, j, False
+        return
+
+    best_i, best_j = best
+    yield from _pair_lines(fromlines, i1, best_i, tolines, j1, best_j)
+    yield best_i, best_j, True
+    yield from _pair_lines(fromlines, best_i + 1, i2, tolines, best_j + 1, j2)
+
+
+def _get_opcodes(fromlines, tolines):
+    # versions of a source usually differ somewhere in the middle, the common
+    # head and tail are matched in linear time and only the rest is diffed
+    limit = min(len(fromlines), len(tolines))
+    prefix = 0
+    while prefix < limit and fromlines[prefix] == tolines[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and fromlines[-1 - suffix] == tolines[-1 - suffix]:
+        suffix += 1
+
+    fromend = len(fromlines) - suffix
+    toend = len(tolines) - suffix
+    opcodes = [("equal", 0, prefix, 0, prefix)] if prefix else []
+    for tag, i1, i2, j1, j2 in _get_middle_opcodes(
+        fromlines[prefix:fromend], tolines[prefix:toend]
+    ):
+        opcodes.append((tag, i1 + prefix, i2 + prefix, j1 + prefix, j2 + prefix))
+    if suffix:
+        opcodes.append(("equal", fromend, len(fromlines), toend, len(tolines)))
+    return opcodes
+
+
+def _get_middle_opcodes(fromlines, tolines):
+    if not fromlines and not tolines:
+        return []
+
+    # SequenceMatcher is quadratic in the worst case, very large files go
+    # through diff-match-patch's line mode instead if it is installed
+    size = sum(map(len, fromlines)) + sum(map(len, tolines))
+    if diff_match_patch is None or size <= LARGE_DIFF_SIZE:
+        # with autojunk, lines like "}" or blank lines that make up more than
+        # 1% of a 200+ line source can't anchor matches, which can give worse
+        # diffs; without it the matcher gets much slower on long sources
+        autojunk = max(len(fromlines), len(tolines)) > NO_AUTOJUNK_MAX_LINES
+        return SequenceMatcher(
+            None, fromlines, tolines, autojunk=autojunk
+        ).get_opcodes()
+
+    dmp = diff_match_patch()
+    fromchars, tochars, _ = dmp.diff_linesToChars(
+        "".join(f"{line}\n" for line in fromlines),
+        "".join(f"{line}\n" for line in tolines),
+    )
+    # every char of the encoded texts stands for one line
+    opcodes = []
+    i = j = 0
+    for operation, chars in dmp.diff_main(fromchars, tochars, False):
+        if operation == dmp.DIFF_EQUAL:
+            opcodes.append(("equal", i, i + len(chars), j, j + len(chars)))
+            i += len(chars)
+            j += len(chars)
+        elif operation == dmp.DIFF_DELETE:
+            opcodes.append(("delete", i, i + len(chars), j, j))
+            i += len(chars)
+        elif opcodes and opcodes[-1][0] == "delete":
+            _, i1, i2, j1, _ = opcodes.pop()
+            opcodes.append(("replace", i1, i2, j1, j + len(chars)))
+            j += len(chars)
+        else:
+            opcodes.append(("insert", i, i, j, j + len(chars)))
+            j += len(chars)
+    return opcodes
+
+
+def _mark_changed_chars(fromline, toline):
+    fromparts = []
+    toparts = []
+    matcher = SequenceMatcher(None, fromline, toline)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            fromparts.append(fromline[i1:i2])
+            toparts.append(toline[j1:j2])
+            continue
+        if i2 > i1:
+            marker = "\0^" if tag == "replace" else "\0-"
+            fromparts.append(f"{marker}{fromline[i1:i2]}\1")
+        if j2 > j1:
+            marker = "\0^" if tag == "replace" else "\0+"
+            toparts.append(f"{marker}{toline[j1:j2]}\1")
+    return "".join(fromparts), "".join(toparts)
+
+
+def get_html_diff() -> CountingHtmlDiff:
+    # HtmlDiff keeps per-call state on the instance, so each worker gets its own
+    if not hasattr(_thread_local, "html_diff"):
+        _thread_local.html_diff = CountingHtmlDiff()
+    return _thread_local.html_diff
+
+
+def make_html_diff(fromlines: list[str], tolines: list[str]) -> tuple[list[str], int]:
+    html_diff = get_html_diff()
+    diff_html = html_diff.make_file_parts(fromlines, tolines)
+    return diff_html, html_diff.diffs_count
+
+
+def make_html_diff_in_pool(
+    fromlines: list[str], tolines: list[str]
+) -> tuple[list[str], int]:
+    # diffing is CPU bound and holds the GIL, so with several cores the files
+    # fetched by the worker threads are diffed in separate processes
+    if not _use_process_pool(fromlines, tolines):
+        return make_html_diff(fromlines, tolines)
+    return _get_process_pool().submit(make_html_diff, fromlines, tolines).result()
+
+
+def count_diffs(fromlines: list[str], tolines: list[str]) -> int:
+    # the number of differing rows the report would show, without rendering it
+    return sum(
+        1
+        for tag, i1, i2, j1, j2 in _get_opcodes(fromlines, tolines)
+        if tag != "equal"
+        for i, j, similar in _pair_lines(fromlines, i1, i2, tolines, j1, j2)
+        if not similar or fromlines[i] != tolines[j]
+    )
+
+
+def count_diffs_in_pool(fromlines: list[str], tolines: list[str]) -> int:
+    if not _use_process_pool(fromlines, tolines):
+        return count_diffs(fromlines, tolines)
+    return _get_process_pool().submit(count_diffs, fromlines, tolines).result()
+
+
+def _use_process_pool(fromlines: list[str], tolines: list[str]) -> bool:
+    return (
+        DIFF_PROCESSES > 1 and len(fromlines) + len(tolines) >= PROCESS_DIFF_MIN_LINES
+    )
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+
+    with _process_pool_lock:
+        if _process_pool is None:
+            # spawn, since forking while worker threads hold locks isn't safe
+            _process_pool = ProcessPoolExecutor(
+                max_workers=DIFF_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _process_pool
+
+
+def split_lines(text: str) -> list[str]:
+    # str.split is noticeably faster than splitlines, which checks every
+    # character against all unicode line boundaries; line endings are unified
+    # first so both sides of a diff are always split by the same rule
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    lines = text.split("\n")
+    if lines and not lines[-1]:
+        lines.pop()
+    # sources repeat lots of lines ("}", blank lines), interning makes equal
+    # lines one object, which is cheaper to compare and to pickle for the pool
+    return list(map(sys.intern, lines))
+
+
+def make_identical_html(filename: str, content: str) -> list[str]:
+    return [
+        IDENTICAL_HTML_TEMPLATE.format(
+            filename=html.escape(filename), content=html.escape(content)
+        )
+    ]
@@ -1,18 +1,22 @@
+import hashlib
 import json
 import sys
 import os
+import time
 
 from .common import fetch, load_env
 from .logger import logger
 from .compiler import (
     get_solc_native_platform_from_os,
     get_compiler_info,
+    compiler_lock,
     prepare_compiler,
     compile_contracts,
     get_target_compiled_contract,
 )
-from .constants import SOLC_DIR
+from .constants import SOLC_DIR, ETHERSCAN_BATCH_SIZE, EXPLORER_RATE_LIMIT_RETRIES
 from .custom_exceptions import ExplorerError
+from .http_cache import get_cached, put_cached
 
 
 def _errorNoSourceCodeAndExit(address):
@@ -20,12 +24,32 @@ def _errorNoSourceCodeAndExit(address):
     sys.exit(1)
 
 
+def _is_rate_limited(response):
+    # etherscan-like APIs answer rate limits with 200 and a NOTOK message,
+    # e.g. "Max rate limit reached" or "Max calls per sec rate limit reached"
+    return (
+        response.get("message") == "NOTOK"
+        and "rate limit" in str(response.get("result")).lower()
+    )
+
+
+def _fetch_etherscan(etherscan_link):
+    for attempt in range(EXPLORER_RATE_LIMIT_RETRIES):
+        response = fetch(etherscan_link).json()
+        if not _is_rate_limited(response):
+            return response
+        delay = 2**attempt
+        logger.warn(f"Explorer rate limit reached, retrying in {delay}s")
+        time.sleep(delay)
+    return fetch(etherscan_link).json()
+
+
 def _get_contract_from_etherscan(token, etherscan_hostname, contract):
     etherscan_link = f"https://{etherscan_hostname}/api?module=contract&action=getsourcecode&address={contract}"
     if token is not None:
         etherscan_link = f"{etherscan_link}&apikey={token}"
 
-    response = fetch(etherscan_link).json()
+    response = _fetch_etherscan(etherscan_link)
 
     if response["message"] == "NOTOK":
         raise ExplorerError(f'Received bad response: {response["result"]}')
@@ -34,6 +58,10 @@ def _get_contract_from_etherscan(token, etherscan_hostname, contract):
     if "ContractName" not in result:
         _errorNoSourceCodeAndExit(contract)
 
+    return _parse_etherscan_result(result)
+
+
+def _parse_etherscan_result(result):
     solc_input = result["SourceCode"]
     contract = {
         "name": result["ContractName"],
@@ -42,7 +70,7 @@ def _get_contract_from_etherscan(token, etherscan_hostname, contract):
     if solc_input.startswith("{{"):
         contract["solcInput"] = json.loads(solc_input[1:-1])
     else:
-        contract["solcInput":] = {
+        contract["solcInput"] = {
             "language": "Solidity",
             "sources": {result["ContractName"]: {"content": solc_input}},
             "settings": {
@@ -67,6 +95,51 @@ def _get_contract_from_etherscan(token, etherscan_hostname, contract):
     return contract
 
 
+# hosts that rejected a batched getsourcecode, they aren't asked again this run
+_hosts_without_batching = set()
+
+
+def _get_contracts_from_etherscan_batch(token, etherscan_hostname, contracts):
+    # getsourcecode takes a few comma-separated addresses at once, results come
+    # back in the same order; chunks that can't be matched are left out and
+    # fetched one by one later
+    result = {}
+    for chunk_start in range(0, len(contracts), ETHERSCAN_BATCH_SIZE):
+        if etherscan_hostname in _hosts_without_batching:
+            break
+        chunk = contracts[chunk_start : chunk_start + ETHERSCAN_BATCH_SIZE]
+        etherscan_link = f"https://{etherscan_hostname}/api?module=contract&action=getsourcecode&address={','.join(chunk)}"
+        if token is not None:
+            etherscan_link = f"{etherscan_link}&apikey={token}"
+
+        try:
+            response = _fetch_etherscan(etherscan_link)
+        except ExplorerError as explorer_error:
+            response = {"result": str(explorer_error)}
+
+        if _is_rate_limited(response):
+            # says nothing about batching, the chunk is fetched one by one later
+            continue
+        if (
+            response.get("message") == "NOTOK"
+            or not isinstance(response.get("result"), list)
+            or len(response["result"]) != len(chunk)
+        ):
+            logger.warn(
+                f"{etherscan_hostname} doesn't take batched getsourcecode requests, fetching contracts one by one"
+            )
+            logger.log(f"Batched getsourcecode failed: {response.get('result')}")
+            _hosts_without_batching.add(etherscan_hostname)
+            break
+
+        for contract, contract_result in zip(chunk, response["result"]):
+            if contract_result.get("ContractName") and contract_result.get(
+                "SourceCode"
+            ):
+                result[contract] = _parse_etherscan_result(contract_result)
+    return result
+
+
 def _get_contract_from_zksync(zksync_explorer_hostname, contract):
     zksync_explorer_link = (
         f"https://{zksync_explorer_hostname}/contract_verification/info/{contract}"
@@ -93,7 +166,7 @@ def _get_contract_from_zksync(zksync_explorer_hostname, contract):
 
 def _get_contract_from_mantle(mantle_explorer_hostname, contract):
     etherscan_link = f"https://{mantle_explorer_hostname}/api?module=contract&action=getsourcecode&address={contract}"
-    response = fetch(etherscan_link).json()
+    response = _fetch_etherscan(etherscan_link)
 
     data = response["result"][0]
     if "ContractName" not in data:
@@ -152,27 +225,86 @@ def _get_contract_from_blockscout(explorer_hostname, contract):
     return contract
 
 
-def get_contract_from_explorer(
-    token, explorer_hostname, contract_address, contract_name_from_config
-):
-    result = {}
+def _get_explorer_backend(token, explorer_hostname):
+    # the API an explorer speaks and the token to send it, every host that
+    # isn't listed here is taken for an etherscan-like one
     if explorer_hostname.startswith("zksync"):
-        result = _get_contract_from_zksync(explorer_hostname, contract_address)
-    elif explorer_hostname.endswith("mantle.xyz"):
-        result = _get_contract_from_mantle(explorer_hostname, contract_address)
-    elif explorer_hostname.endswith("lineascan.build"):
-        result = _get_contract_from_etherscan(None, explorer_hostname, contract_address)
-    elif (
+        return "zksync", token
+    if explorer_hostname.endswith("mantle.xyz"):
+        return "mantle", token
+    if explorer_hostname.endswith("lineascan.build"):
+        return "etherscan", None
+    if (
         explorer_hostname.endswith("mode.network")
         or explorer_hostname.endswith("blockscout.com")
         or explorer_hostname.endswith("swellnetwork.io")
     ):
+        return "blockscout", token
+    return "etherscan", token
+
+
+def _get_explorer_cache_key(explorer_hostname, contract_address):
+    # configs spell addresses checksummed or lowercase, both are the same contract
+    return f"explorer|{explorer_hostname}|{contract_address.lower()}"
+
+
+def get_contracts_from_explorer_batch(token, explorer_hostname, contract_addresses):
+    result = {}
+    for contract_address in contract_addresses:
+        cached = get_cached(
+            _get_explorer_cache_key(explorer_hostname, contract_address)
+        )
+        if cached:
+            result[contract_address] = cached["body"]
+
+    backend, token = _get_explorer_backend(token, explorer_hostname)
+    if backend != "etherscan":
+        return result
+
+    fetched = _get_contracts_from_etherscan_batch(
+        token,
+        explorer_hostname,
+        [address for address in contract_addresses if address not in result],
+    )
+    for contract_address, contract in fetched.items():
+        put_cached(
+            _get_explorer_cache_key(explorer_hostname, contract_address), contract
+        )
+
+    return result | fetched
+
+
+def get_contract_from_explorer(
+    token,
+    explorer_hostname,
+    contract_address,
+    contract_name_from_config,
+    prefetched_contract=None,
+):
+    result = {}
+    cache_key = _get_explorer_cache_key(explorer_hostname, contract_address)
+    cached = get_cached(cache_key) if prefetched_contract is None else None
+
+    backend, token = _get_explorer_backend(token, explorer_hostname)
+
+    if prefetched_contract is not None:
+        result = prefetched_contract
+    elif cached:
+        result = cached["body"]
+    elif backend == "zksync":
+        result = _get_contract_from_zksync(explorer_hostname, contract_address)
+    elif backend == "mantle":
+        result = _get_contract_from_mantle(explorer_hostname, contract_address)
+    elif backend == "blockscout":
         result = _get_contract_from_blockscout(explorer_hostname, contract_address)
     else:
         result = _get_contract_from_etherscan(
             token, explorer_hostname, contract_address
         )
 
+    if prefetched_contract is None and not cached:
+        put_cached(cache_key, result)
+
     contract_name_from_etherscan = result["name"]
     if contract_name_from_etherscan != contract_name_from_config:
         raise ExplorerError(
@@ -184,33 +316,43 @@ def get_contract_from_explorer(
 
 
 def compile_contract_from_explorer(contract_code):
+    input_settings = json.dumps(contract_code["solcInput"])
+    target_contract_name = contract_code["name"]
+
+    # the output of a compiler build for the same input never changes
+    cache_key = "|".join(
+        (
+            "compiled",
+            contract_code["compiler"],
+            target_contract_name,
+            hashlib.sha256(input_settings.encode()).hexdigest(),
+        )
+    )
+    cached = get_cached(cache_key)
+    if cached:
+        logger.okay(f"Compiled contract loaded from cache")
+        return cached["body"]
+
     required_platform = get_solc_native_platform_from_os()
     build_name = contract_code["compiler"][1:]
     build_info = get_compiler_info(required_platform, build_name)
     compiler_path = os.path.join(SOLC_DIR, build_info["path"])
 
-    is_compiler_already_prepared = os.path.isfile(compiler_path)
+    with compiler_lock(compiler_path):
+        is_compiler_already_prepared = os.path.isfile(compiler_path)
 
-    if not is_compiler_already_prepared:
-        prepare_compiler(required_platform, build_info, compiler_path)
+        if not is_compiler_already_prepared:
+            prepare_compiler(required_platform, build_info, compiler_path)
 
-    input_settings = json.dumps(contract_code["solcInput"])
     compiled_contracts = compile_contracts(compiler_path, input_settings)[
         "contracts"
     ].values()
 
-    is_compiler_already_prepared = os.path.isfile(compiler_path)
-
-    if not is_compiler_already_prepared:
-        prepare_compiler(required_platform, build_info, compiler_path)
-
-    input_settings = json.dumps(contract_code["solcInput"])
-    compiled_contracts = compile_contracts(compiler_path, input_settings)[
-        "contracts"
-    ].values()
-
-    target_contract_name = contract_code["name"]
-    return get_target_compiled_contract(compiled_contracts, target_contract_name)
+    target_compiled_contract = get_target_compiled_contract(
+        compiled_contracts, target_contract_name
+    )
+    put_cached(cache_key, target_compiled_contract)
+    return target_compiled_contract
 
 
 def parse_compiled_contract(target_compiled_contract):
@@ -1,6 +1,11 @@
 import base64
+import json
 
-from .common import fetch, parse_repo_link
+import requests
+
+from .common import fetch, parse_repo_link, request_slot, session
+from .constants import GITHUB_GRAPHQL_URL, GITHUB_GRAPHQL_BATCH_SIZE
+from .http_cache import get_cached, put_cached, is_pinned_commit, is_fresh, mark_fresh
 from .logger import logger
 
 
@@ -16,9 +21,22 @@ def get_file_from_github(github_api_token, dependency_repo, path_to_file, dep_na
         dependency_repo["commit"],
     )
 
-    github_data = fetch(
-        github_api_url, headers={"Authorization": f"token {github_api_token}"}
-    ).json()
+    cached = get_cached(github_api_url)
+    if cached and (
+        is_pinned_commit(dependency_repo["commit"]) or is_fresh(github_api_url)
+    ):
+        return cached["body"]
+
+    headers = {"Authorization": f"token {github_api_token}"}
+    if cached and cached["etag"]:
+        headers["If-None-Match"] = cached["etag"]
+
+    response = fetch(github_api_url, headers=headers)
+    if response.status_code == 304:
+        mark_fresh(github_api_url)
+        return cached["body"]
+
+    github_data = response.json()
 
     if not github_data:
         logger.error("No github data for", github_api_url)
@@ -30,7 +48,108 @@ def get_file_from_github(github_api_token, dependency_repo, path_to_file, dep_na
         logger.error("No file content")
         return None
 
-    return base64.b64decode(file_content).decode()
+    file_content = base64.b64decode(file_content).decode()
+    put_cached(github_api_url, file_content, response.headers.get("ETag"))
+
+    return file_content
+
+
+def get_files_from_github_batch(
+    github_api_token, dependency_repo, paths_to_files, dep_name
+):
+    # fetch many files of the same repo commit with a few GraphQL queries
+    # instead of one REST call per file, files not found are left out
+    user_slash_repo = parse_repo_link(dependency_repo["url"])
+    owner, repo_name = user_slash_repo.split("/")[:2]
+    commit = dependency_repo["commit"] or "HEAD"
+    relative_root = dependency_repo["relative_root"]
+
+    files = {}
+    is_pinned = is_pinned_commit(commit)
+    for path_to_file in paths_to_files:
+        cache_key = _get_cache_key(
+            user_slash_repo, dependency_repo, path_to_file, dep_name
+        )
+        cached = get_cached(cache_key)
+        if cached and (is_pinned or is_fresh(cache_key)):
+            files[path_to_file] = cached["body"]
+    paths_to_files = [path for path in paths_to_files if path not in files]
+
+    for chunk_start in range(0, len(paths_to_files), GITHUB_GRAPHQL_BATCH_SIZE):
+        chunk = paths_to_files[chunk_start : chunk_start + GITHUB_GRAPHQL_BATCH_SIZE]
+        objects = []
+        for index, path_to_file in enumerate(chunk):
+            path_in_repo = path_to_file_without_dependency(path_to_file, dep_name)
+            if relative_root:
+                path_in_repo = f"{relative_root}/{path_in_repo}"
+            expression = json.dumps(f"{commit}:{path_in_repo}")
+            objects.append(
+                f"f{index}: object(expression: {expression}) "
+                "{ ... on Blob { text isTruncated isBinary } }"
+            )
+        query = (
+            f"query {{ repository(owner: {json.dumps(owner)}, name: {json.dumps(repo_name)}) "
+            f"{{ {' '.join(objects)} }} }}"
+        )
+
+        repository = _post_github_graphql(github_api_token, query)
+        if repository is None:
+            return files
+
+        for index, path_to_file in enumerate(chunk):
+            blob = repository.get(f"f{index}")
+            # truncated and binary blobs are left to the REST fallback
+            if (
+                blob
+                and blob.get("text") is not None
+                and not blob.get("isTruncated")
+                and not blob.get("isBinary")
+            ):
+                files[path_to_file] = blob["text"]
+                put_cached(
+                    _get_cache_key(
+                        user_slash_repo, dependency_repo, path_to_file, dep_name
+                    ),
+                    blob["text"],
+                )
+
+    return files
+
+
+def _get_cache_key(user_slash_repo, dependency_repo, path_to_file, dep_name):
+    # same key as the REST fetch uses, so both paths share cached files
+    return get_github_api_url(
+        user_slash_repo,
+        dependency_repo["relative_root"],
+        path_to_file_without_dependency(path_to_file, dep_name),
+        dependency_repo["commit"],
+    )
+
+
+def _post_github_graphql(github_api_token, query):
+    logger.log(f"Pull: {GITHUB_GRAPHQL_URL}")
+    try:
+        with request_slot(GITHUB_GRAPHQL_URL):
+            response = session.post(
+                GITHUB_GRAPHQL_URL,
+                json={"query": query},
+                headers={"Authorization": f"bearer {github_api_token}"},
+            )
+        response.raise_for_status()
+        body = response.json()
+    except (requests.exceptions.RequestException, ValueError) as req_err:
+        logger.log(f"GraphQL request failed, falling back to REST: {req_err}")
+        return None
+
+    # with errors, data may still hold the objects that were resolved, the
+    # files missing from it are fetched with REST
+    if not isinstance(body, dict):
+        logger.log("GraphQL response is not an object, falling back to REST")
+        return None
+    if body.get("errors"):
+        logger.warn("GraphQL query returned errors", body["errors"])
+    data = body.get("data") or {}
+    return data.get("repository")
 
 
 def get_file_from_github_recursive(
@@ -39,6 +158,30 @@ def get_file_from_github_recursive(
     path_to_file = path_to_file_without_dependency(path_to_file, dep_name)
     user_slash_repo = parse_repo_link(dependency_repo["url"])
 
+    # the file found by the search is cached under the path it was asked by
+    cache_key = "recursive|" + get_github_api_url(
+        user_slash_repo,
+        dependency_repo["relative_root"],
+        path_to_file,
+        dependency_repo["commit"],
+    )
+    is_pinned = is_pinned_commit(dependency_repo["commit"])
+    cached = get_cached(cache_key) if is_pinned else None
+    if cached:
+        return cached["body"]
+
+    file_content = _get_file_from_github_recursive(
+        github_api_token, dependency_repo, user_slash_repo, path_to_file
+    )
+    if file_content and is_pinned:
+        put_cached(cache_key, file_content)
+
+    return file_content
+
+
+def _get_file_from_github_recursive(
+    github_api_token, dependency_repo, user_slash_repo, path_to_file
+):
     direct_file_content = _get_direct_file(
         github_api_token,
         user_slash_repo,
@@ -151,11 +294,16 @@ def path_to_file_without_dependency(path_to_file, dep_name):
 def resolve_dep(path_to_file, config):
     # find the dependency that matches the path_to_file
     # e.g. "@openzeppelin/contracts-v4.4" in "@openzeppelin/contracts-v4.4/utils/structs/EnumerableSet.sol"
-    dep_names = sorted(list(config["dependencies"].keys()), key=len, reverse=True)
-
-    for dep_name in dep_names:
-        if path_to_file.startswith(f"{dep_name}/"):
-            return (config["dependencies"][dep_name], dep_name)
+    # dependencies are keyed by path prefix, so try the prefixes of path_to_file
+    # from the longest one instead of scanning all dependencies
+    dependencies = config["dependencies"]
+    slash_index = path_to_file.rfind("/")
+
+    while slash_index > 0:
+        dep_name = path_to_file[:slash_index]
+        if dep_name in dependencies:
+            return (dependencies[dep_name], dep_name)
+        slash_index = path_to_file.rfind("/", 0, slash_index)
 
     return (None, None)
 
@@ -1,5 +1,7 @@
 import os
-from shutil import rmtree
+from shutil import copyfile, rmtree
+
+from .constants import WRITE_BUFFER_SIZE
 
 
 def remove_directory(directory: str):
@@ -9,3 +11,15 @@ def remove_directory(directory: str):
 
 def create_dirs(path: str):
     os.makedirs(os.path.dirname(path), exist_ok=True)
+
+
+def write_file(path: str, chunks: list[str]):
+    # reports are encoded chunk by chunk straight into a large binary buffer,
+    # without the text layer's newline translation and small pending buffer
+    with open(path, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+        for chunk in chunks:
+            f.write(chunk.encode("utf-8", errors="xmlcharrefreplace"))
+
+
+def copy_file(source: str, destination: str):
+    copyfile(source, destination)
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import re
+import uuid
+
+from .constants import CACHE_DIR
+from .custom_exceptions import CacheError
+from .helpers import create_dirs
+
+
+class CacheSettings:
+    refresh = False
+
+    @staticmethod
+    def initialize(refresh: bool) -> None:
+        CacheSettings.refresh = refresh
+        _check_cache_dir()
+
+
+def _check_cache_dir() -> None:
+    # cached entries are served without a request, so a directory someone else
+    # controls could plant sources that compare as identical
+    os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+    if not hasattr(os, "getuid"):
+        return
+    stat = os.stat(CACHE_DIR)
+    if stat.st_uid != os.getuid():
+        raise CacheError(f"{CACHE_DIR} is not owned by the current user")
+    if stat.st_mode & 0o022:
+        raise CacheError(f"{CACHE_DIR} is writable by other users")
+
+
+_SHARD_NAME = re.compile(r"[0-9a-f]{2}")
+_ENTRY_NAME = re.compile(r"[0-9a-f]{64}\.json(\..+\.tmp)?")
+
+
+def clear_cache() -> None:
+    # the directory can be set to any path, so only the files this module
+    # writes are removed and everything else in it is left alone
+    if not os.path.isdir(CACHE_DIR):
+        return
+    with os.scandir(CACHE_DIR) as shards:
+        shard_paths = [
+            shard.path
+            for shard in shards
+            if shard.is_dir(follow_symlinks=False) and _SHARD_NAME.fullmatch(shard.name)
+        ]
+    for shard_path in shard_paths:
+        with os.scandir(shard_path) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False) and _ENTRY_NAME.fullmatch(
+                    entry.name
+                ):
+                    os.remove(entry.path)
+        if not os.listdir(shard_path):
+            os.rmdir(shard_path)
+
+
+# entries already read or written in this run, so files shared by many
+# contracts don't hit the disk again
+_memory_cache = {}
+# keys fetched or revalidated in this run, their entries are up to date even
+# for a branch, so other contracts don't revalidate them again
+_fresh_keys = set()
+
+
+def _cache_path(key: str) -> str:
+    # entries are spread over 256 subdirectories so none of them gets huge
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return os.path.join(CACHE_DIR, digest[:2], f"{digest}.json")
+
+
+def get_cached(key: str) -> dict | None:
+    # with refresh every entry on disk is treated as missing and gets overwritten
+    if key in _memory_cache:
+        return _memory_cache[key]
+    if CacheSettings.refresh:
+        return None
+    try:
+        with open(_cache_path(key), mode="r") as cache_file:
+            entry = json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+    _memory_cache[key] = entry
+    return entry
+
+
+def put_cached(key: str, body, etag: str | None = None) -> None:
+    path = _cache_path(key)
+    create_dirs(path)
+    # write to a temporary file first so concurrent readers never see a partial entry
+    tmp_path = f"{path}.{uuid.uuid4()}.tmp"
+    with open(tmp_path, mode="w") as cache_file:
+        json.dump({"etag": etag, "body": body}, cache_file)
+    os.replace(tmp_path, path)
+    _memory_cache[key] = {"etag": etag, "body": body}
+    _fresh_keys.add(key)
+
+
+def mark_fresh(key: str) -> None:
+    _fresh_keys.add(key)
+
+
+def is_fresh(key: str) -> bool:
+    return key in _fresh_keys
+
+
+def is_pinned_commit(commit: str | None) -> bool:
+    # contents of a full commit sha never change, so cached entries for it never expire
+    return (
+        bool(commit)
+        and len(commit) == 40
+        and all(char in "0123456789abcdefABCDEF" for char in commit)
+    )
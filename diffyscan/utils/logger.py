@@ -1,3 +1,8 @@
+import contextlib
+import dataclasses
+import sys
+import threading
+
 import termtables
 
 from .constants import LOGS_PATH
@@ -20,17 +25,75 @@ END = "\033[0m"
 class Logger:
     def __init__(self, log_file):
         self.log_file = log_file
+        # files are diffed concurrently, keep lines from different threads apart
+        self.lock = threading.Lock()
+        self.buffers = threading.local()
+        # with quiet only warnings, errors and reports go to stdout
+        self.quiet = False
+
+    # collect everything the current thread logs and write it out at once,
+    # so the output of contracts processed in parallel doesn't interleave;
+    # a buffer opened inside another one (a contract of a config processed in
+    # parallel) is handed to the outer buffer as a whole
+    @contextlib.contextmanager
+    def buffered(self):
+        parent_entries = getattr(self.buffers, "entries", None)
+        self.buffers.entries = []
+        try:
+            yield
+        finally:
+            entries = self.buffers.entries
+            self.buffers.entries = parent_entries
+            with self.lock:
+                if parent_entries is not None:
+                    parent_entries.extend(entries)
+                else:
+                    self._write_entries(entries)
+
+    def _write_entries(self, entries):
+        create_dirs(self.log_file)
+        with open(self.log_file, mode="a") as logs:
+            logs.writelines(text + "\n" for is_log, text, _ in entries if is_log)
+        for is_log, text, end_char in entries:
+            if not is_log:
+                print(text, end=end_char)
+        sys.stdout.flush()
+
+    # worker threads started for a contract log into the buffer of the contract
+    # thread that submitted them, not straight to stdout
+    def bound(self, function):
+        entries = getattr(self.buffers, "entries", None)
+
+        def run(*args, **kwargs):
+            previous_entries = getattr(self.buffers, "entries", None)
+            self.buffers.entries = entries
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.buffers.entries = previous_entries
+
+        return run
 
     # log to file
     def log(self, text):
-        create_dirs(self.log_file)
-        with open(self.log_file, mode="a") as logs:
-            logs.write(text + "\n")
+        entries = getattr(self.buffers, "entries", None)
+        if entries is not None:
+            entries.append((True, text, None))
+            return
+        with self.lock:
+            create_dirs(self.log_file)
+            with open(self.log_file, mode="a") as logs:
+                logs.write(text + "\n")
 
     # print to std out
     def stdout(self, text, overwrite=False):
         end_char = "\r" if overwrite else "\n"
-        print(text, end=end_char, flush=overwrite)
+        entries = getattr(self.buffers, "entries", None)
+        if entries is not None:
+            entries.append((False, text, end_char))
+            return
+        with self.lock:
+            print(text, end=end_char, flush=overwrite)
 
     def info(self, text, value=None):
         log_text = "🔵 [INFO] " + text
@@ -41,7 +104,8 @@ class Logger:
             stdout_text = self.cln(stdout_text, self.hl(value, BOLD))
 
         self.log(log_text)
-        self.stdout(stdout_text)
+        if not self.quiet:
+            self.stdout(stdout_text)
 
     def update_info(self, text, value=None):
         log_text = "🔵 [INFO] " + text
@@ -52,7 +116,8 @@ class Logger:
             stdout_text = self.cln(stdout_text, self.hl(value, BOLD))
 
         self.log(log_text)
-        self.stdout(stdout_text + (" " * 100), overwrite=True)
+        if not self.quiet:
+            self.stdout(stdout_text + (" " * 100), overwrite=True)
 
     def okay(self, text, value=None):
         log_text = "🟢 [OKAY] " + text
@@ -63,7 +128,8 @@ class Logger:
             stdout_text += ": " + self.hl(value, BOLD)
 
         self.log(log_text)
-        self.stdout(stdout_text)
+        if not self.quiet:
+            self.stdout(stdout_text)
 
     def warn(self, text, value=None):
         log_text = "🟠 [WARN] " + text
@@ -87,7 +153,8 @@ class Logger:
         self.log(log_text)
         self.stdout(stdout_text)
 
-    def report_table(self, table):
+    def report_table(self, report):
+        table = [dataclasses.astuple(row) for row in report]
         log_table = termtables.to_string(
             table,
             header=["#", "Filename", "Found", "Diffs", "Origin", "Report"],
@@ -95,7 +162,7 @@ class Logger:
         )
         self.log(log_table)
 
-        stdout_table = [self.color_row(row) for row in table]
+        stdout_table = [self.color_row(row) for row in report]
         table_colored_string = termtables.to_string(
             stdout_table,
             header=["#", "Filename", "Found", "Diffs", "Origin", "Report"],
@@ -107,15 +174,15 @@ class Logger:
     def color_row(self, row):
         hlcolor = GREEN
 
-        file_found = row[2]
-        diffs_found = row[3] is not None and row[3] > 0
+        file_found = row.file_found
+        diffs_found = row.diffs_count is not None and row.diffs_count > 0
 
         if not file_found:
             hlcolor = RED
         elif diffs_found:
             hlcolor = RED
 
-        return [self.hl(cell, hlcolor) for cell in row]
+        return [self.hl(cell, hlcolor) for cell in dataclasses.astuple(row)]
 
     def hl(self, text, color=BOLD):
         return f"{color}{text}{END}"
@@ -134,7 +201,8 @@ class Logger:
 
     def divider(self):
         self.log(" - +" * 20)
-        self.stdout((self.hlred(" -") + self.hlgreen(" +")) * 20)
+        if not self.quiet:
+            self.stdout((self.hlred(" -") + self.hlgreen(" +")) * 20)
 
 
 logger = Logger(LOGS_PATH)
@@ -1,3 +1,4 @@
+import functools
 import json
 
 from .common import pull, mask_text
@@ -28,6 +29,14 @@ def get_bytecode_from_node(contract_address, rpc_url):
     return sources_url_response_in_json["result"]
 
 
+# the code deployed at an address doesn't change, a contract listed in several
+# configs of a run is fetched from the remote node once; local deployments
+# are not cached, the local node is restarted for every config
+@functools.lru_cache(maxsize=1024)
+def get_remote_bytecode(contract_address, rpc_url):
+    return get_bytecode_from_node(contract_address, rpc_url)
+
+
 def get_account(rpc_url):
     logger.info(f'Receiving the account from "{rpc_url}" ...')
 
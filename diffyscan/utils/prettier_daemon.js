@@ -0,0 +1,31 @@
+// Long-lived prettier process for diffyscan: reads one JSON request per line
+// ({"source": "..."}) from stdin and writes one JSON response per line
+// ({"formatted": "..."} or {"error": "..."}) to stdout, in request order.
+// prettier and its solidity plugin are resolved from the working directory,
+// like `npx prettier` does.
+const path = require("path");
+const readline = require("readline");
+const { createRequire } = require("module");
+
+const requireFromCwd = createRequire(path.join(process.cwd(), "package.json"));
+const prettier = requireFromCwd("prettier");
+const solidityPlugin = requireFromCwd.resolve("prettier-plugin-solidity");
+
+let pending = Promise.resolve();
+
+readline.createInterface({ input: process.stdin }).on("line", (line) => {
+  pending = pending.then(async () => {
+    let response;
+    try {
+      const { source } = JSON.parse(line);
+      const formatted = await prettier.format(source, {
+        filepath: "contract.sol",
+        plugins: [solidityPlugin],
+      });
+      response = { formatted };
+    } catch (error) {
+      response = { error: String(error) };
+    }
+    process.stdout.write(JSON.stringify(response) + "\n");
+  });
+});
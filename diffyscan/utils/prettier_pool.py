@@ -0,0 +1,118 @@
+import json
+import os
+import subprocess
+import threading
+
+from .constants import PRETTIER_WORKERS
+from .custom_exceptions import PrettierError
+from .logger import logger
+
+PRETTIER_DAEMON_PATH = os.path.join(os.path.dirname(__file__), "prettier_daemon.js")
+
+
+class PrettierPool:
+    def __init__(self, size: int):
+        self.size = size
+        self.processes = []
+        self.idle_processes = []
+        self.lock = threading.Lock()
+        # one slot per daemon in use, a dropped daemon frees its slot for a new one
+        self.slots = threading.BoundedSemaphore(size)
+
+    def format(self, solidity_contract_content: str) -> str:
+        process = self._acquire()
+        try:
+            process.stdin.write(json.dumps({"source": solidity_contract_content}))
+            process.stdin.write("\n")
+            process.stdin.flush()
+            response_line = process.stdout.readline()
+        except OSError as os_err:
+            response_line = ""
+            logger.log(f"Prettier daemon failed: {os_err}")
+
+        try:
+            response = json.loads(response_line) if response_line else None
+        except ValueError:
+            response = None
+
+        # a daemon that died or answers out of protocol is never handed out again
+        if not isinstance(response, dict):
+            self._drop(process)
+            logger.warn("Prettier daemon failed, formatting with npx prettier")
+            return _format_with_npx(solidity_contract_content)
+        self._release(process)
+
+        if "formatted" not in response:
+            raise PrettierError(response.get("error", "no formatted source"))
+        return response["formatted"]
+
+    def stop(self):
+        with self.lock:
+            for process in self.processes:
+                if process.poll() is None:
+                    process.stdin.close()
+                    process.terminate()
+                    process.wait()
+            self.processes = []
+            self.idle_processes = []
+
+    def _acquire(self) -> subprocess.Popen:
+        # node processes are started lazily, up to the pool size, while all
+        # running ones are busy
+        self.slots.acquire()
+        with self.lock:
+            if self.idle_processes:
+                return self.idle_processes.pop()
+            try:
+                process = subprocess.Popen(
+                    ["node", PRETTIER_DAEMON_PATH],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    text=True,
+                    encoding="utf-8",
+                )
+            except OSError as os_err:
+                self.slots.release()
+                raise PrettierError(f"failed to start node: {os_err}")
+            self.processes.append(process)
+            return process
+
+    def _release(self, process: subprocess.Popen):
+        with self.lock:
+            self.idle_processes.append(process)
+        self.slots.release()
+
+    def _drop(self, process: subprocess.Popen):
+        process.kill()
+        process.wait()
+        with self.lock:
+            if process in self.processes:
+                self.processes.remove(process)
+        self.slots.release()
+
+
+def _format_with_npx(solidity_contract_content: str) -> str:
+    # the one-shot path, slower but independent of the daemons; like the
+    # daemon's prettier.format call it ignores any prettier config, editorconfig
+    # and ignore file in the working directory, so both paths format the same
+    result = subprocess.run(
+        [
+            "npx",
+            "prettier",
+            "--plugin=prettier-plugin-solidity",
+            "--no-config",
+            "--no-editorconfig",
+            f"--ignore-path={os.devnull}",
+            "--stdin-filepath=contract.sol",
+        ],
+        input=solidity_contract_content,
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+    )
+    if result.returncode != 0:
+        raise PrettierError(result.stderr.strip() or "npx prettier failed")
+    return result.stdout
+
+
+prettier_pool = PrettierPool(PRETTIER_WORKERS)
@@ -0,0 +1,95 @@
+import difflib
+
+from diffyscan.utils.diff import (
+    _get_opcodes,
+    count_diffs,
+    make_html_diff,
+    split_lines,
+)
+
+
+def table_rows(fromlines, tolines):
+    parts, diffs_count = make_html_diff(fromlines, tolines)
+    assert diffs_count == count_diffs(fromlines, tolines)
+    return [part for part in parts if part.lstrip().startswith("<tr>")], diffs_count
+
+
+def test_split_lines():
+    assert split_lines("") == []
+    assert split_lines("a\nb\n") == ["a", "b"]
+    assert split_lines("a\n\nb") == ["a", "", "b"]
+    assert split_lines("a\r\nb\rc\n") == ["a", "b", "c"]
+
+
+def test_opcodes_match_sequence_matcher():
+    fromlines = ["a", "b", "c", "d", "e"]
+    tolines = ["a", "b", "x", "d", "e", "f"]
+    assert _get_opcodes(fromlines, tolines) == (
+        difflib.SequenceMatcher(None, fromlines, tolines).get_opcodes()
+    )
+
+
+def test_opcodes_of_identical_and_empty_lines():
+    assert _get_opcodes([], []) == []
+    assert _get_opcodes(["a", "b"], ["a", "b"]) == [("equal", 0, 2, 0, 2)]
+    assert _get_opcodes([], ["a"]) == [("insert", 0, 0, 0, 1)]
+
+
+def test_table_of_empty_sources():
+    rows, diffs_count = table_rows([], [])
+    assert diffs_count == 0
+    assert len(rows) <= 1
+    assert not any("diff_add" in row or "diff_sub" in row for row in rows)
+
+
+def test_table_of_inserted_line():
+    rows, diffs_count = table_rows(["a", "c"], ["a", "b", "c"])
+    assert diffs_count == 1
+    assert len(rows) == 3
+    assert '<span class="diff_add">b</span>' in rows[1]
+    assert "diff_sub" not in rows[1]
+
+
+def test_table_of_deleted_line():
+    rows, diffs_count = table_rows(["a", "b", "c"], ["a", "c"])
+    assert diffs_count == 1
+    assert len(rows) == 3
+    assert '<span class="diff_sub">b</span>' in rows[1]
+    assert "diff_add" not in rows[1]
+
+
+def test_table_of_replaced_line():
+    rows, diffs_count = table_rows(
+        ["a", "uint256 x = 1;", "c"], ["a", "uint256 x = 2;", "c"]
+    )
+    assert diffs_count == 1
+    assert len(rows) == 3
+    assert rows[1].count('<span class="diff_chg">') == 2
+    assert "diff_add" not in rows[1] and "diff_sub" not in rows[1]
+
+
+def test_table_of_dissimilar_replaced_lines():
+    rows, diffs_count = table_rows(["a", "foo", "c"], ["a", "1234567", "c"])
+    assert diffs_count == 1
+    assert '<span class="diff_sub">foo</span>' in rows[1]
+    assert '<span class="diff_add">1234567</span>' in rows[1]
+
+
+def test_table_of_blank_lines():
+    rows, diffs_count = table_rows(["x", "y"], ["x", "", "y"])
+    assert diffs_count == 1
+    assert '<span class="diff_add">&nbsp;</span>' in rows[1]
+
+    rows, diffs_count = table_rows(["x", "", "y"], ["x", "y"])
+    assert diffs_count == 1
+    assert '<span class="diff_sub">&nbsp;</span>' in rows[1]
+
+
+def test_table_pairs_similar_lines_in_replaced_block():
+    rows, diffs_count = table_rows(
+        ["a", "function f() {", "}"], ["a", "", "function g() {", "}"]
+    )
+    assert diffs_count == 2
+    assert '<span class="diff_add">&nbsp;</span>' in rows[1]
+    assert "diff_sub" not in rows[1]
+    assert rows[2].count('<span class="diff_chg">') == 2